@@ -6,27 +6,82 @@ from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # local imports
 from config import Config
+from .assets import init_assets
+from .profiler import RequestProfiler
+from .throttle import Throttle
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+throttle = Throttle()
+profiler = RequestProfiler()
+
+
+def precompile_templates(app):
+    """
+    Compile every template up front so the first requests don't have to
+    """
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+
+def warm_up(app):
+    """
+    Prepare a freshly forked worker before it serves requests.
+
+    Nothing is cached: the worker gets its own connection pool, configured
+    mappers and compiled templates.  Opening one connection checks the
+    database is reachable and, with a pooling engine such as MySQL's, leaves
+    it in the pool for the first request.  SQLite file databases use
+    NullPool, so there the connection is simply closed again.
+    """
+    from sqlalchemy.orm import configure_mappers
+
+    with app.app_context():
+        # connections inherited from the parent process must not be reused
+        db.engine.dispose()
+        configure_mappers()
+        db.engine.connect().close()
+
+    # cheap if the master already compiled them before forking
+    precompile_templates(app)
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    if app.config.get('PROXY_COUNT'):
+        # take the client address from the proxies, not the proxy's own
+        count = app.config['PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
+
+    if app.config.get('TEMPLATE_CACHE_DIR'):
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
     Bootstrap(app)
+    init_assets(app)
     db.init_app(app)
+    if app.config.get('SQLITE_TUNING'):
+        from .sqlite import init_sqlite_profile
+        init_sqlite_profile(app)
     login_manager.init_app(app)
     login_manager.login_message = "You must be logged in to access this page."
     login_manager.login_view = "auth.login"
+    throttle.init_app(app)
+    profiler.init_app(app)
     migrate = Migrate(app, db)
 
     from app import models
 
+    from .commands import register_commands
+    register_commands(app)
+
     from .admin import admin as admin_blueprint
     app.register_blueprint(admin_blueprint, url_prefix='/admin')
 
@@ -36,6 +91,12 @@ def create_app(config_class=Config):
     from .home import home as home_blueprint
     app.register_blueprint(home_blueprint)
 
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api')
+
+    if app.config.get('PRECOMPILE_TEMPLATES'):
+        precompile_templates(app)
+
     @app.errorhandler(403)
     def forbidden(error):
         return render_template('errors/403.html', title='Forbidden'), 403
@@ -44,6 +105,11 @@ def create_app(config_class=Config):
     def page_not_found(error):
         return render_template('errors/404.html', title='Page Not Found'), 404
 
+    @app.errorhandler(429)
+    def too_many_requests(error):
+        return render_template('errors/429.html', title='Too Many Requests'), 429, \
+            {'Retry-After': str(app.config['THROTTLE_WINDOW'])}
+
     @app.errorhandler(500)
     def internal_server_error(error):
         return render_template('errors/500.html', title='Server Error'), 500
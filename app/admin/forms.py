@@ -12,6 +12,10 @@ def source_options():
     return ListingSource.query
 
 
+def upper_case(value):
+    return value.upper() if value else value
+
+
 class ListingForm(FlaskForm):
     listing_date = DateField('Date', format='%Y-%m-%d', validators=[DataRequired()])
     name = StringField('Name', validators=[DataRequired()])
@@ -21,13 +25,19 @@ class ListingForm(FlaskForm):
                                  allow_blank=False, get_label='description')
     address_1 = StringField('Address line 1')
     address_2 = StringField('Address line 2')
-    post_code = StringField('Post code')
+    post_code = StringField('Post code', filters=[upper_case])
     description = StringField('Description',
                               validators=[Length(min=5, max=140)])
     outgoing = BooleanField('Outgoing', default=False)
+    version = HiddenField()
     submit = SubmitField('Submit')
 
 
+class BulkListingForm(FlaskForm):
+    mark_outgoing = SubmitField('Mark outgoing')
+    delete = SubmitField('Delete selected')
+
+
 class ListingSourceForm(FlaskForm):
     description = TextAreaField('Description',
                                 validators=[DataRequired(), Length(min=5, max=100)])
@@ -1,12 +1,18 @@
-from flask import abort, flash, redirect, render_template, url_for
+from flask import Response, abort, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
-from datetime import datetime, date
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.orm.exc import StaleDataError
 from . import admin
-from app.admin.forms import ListingForm, ListingSourceForm, AddUserForm, EditUserForm
-from .. import db
-from ..models import User, ListingSource, Listing, get_listing_sources
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+from app.admin.forms import ListingForm, BulkListingForm, ListingSourceForm, AddUserForm, EditUserForm
+from .. import db, profiler
+from ..models import User, ListingSource, Listing, ListingBand, ListingEvent, get_listing_sources, log_listing_event, \
+    starts_with
+from ..dedupe import find_exact_duplicate, find_similar, index_listing
+from ..sheets import get_listings_sheet
+from ..utils import json_serial
+
+USERS_PER_PAGE = 50
 
 
 def check_admin():
@@ -15,14 +21,6 @@ def check_admin():
         abort(403)
 
 
-def json_serial(obj):
-    """JSON serializer for objects not serializable by default json code"""
-
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    raise TypeError("Type %s not serializable" % type(obj))
-
-
 # Listing Views
 
 @admin.route('/listings', methods=['GET', 'POST'])
@@ -34,9 +32,10 @@ def list_listings():
     check_admin()
 
     listings = current_user.own_listings()
+    form = BulkListingForm()
 
     return render_template('admin/listings/listings.html',
-                           listings=listings, title="Listings")
+                           listings=listings, form=form, title="Listings")
 
 
 @admin.route('/listings/add', methods=['GET', 'POST'])
@@ -51,6 +50,16 @@ def add_listing():
 
     form = ListingForm()
     if form.validate_on_submit():
+        duplicate = find_exact_duplicate(form.name.data, form.post_code.data, form.listing_date.data)
+        if duplicate is not None:
+            form.name.errors.append('This matches listing {} with the same name, post code and date.'
+                                    .format(duplicate.id))
+            return render_template('admin/listings/listing.html', action="Add",
+                                   add_listing=add_listing, form=form,
+                                   title="Add Listing")
+
+        similar = find_similar(form.description.data)
+
         listing = Listing(description=form.description.data, author=current_user,
                           listing_date=form.listing_date.data, name=form.name.data, email=form.email.data,
                           address_1=form.address_1.data, address_2=form.address_2.data,
@@ -60,13 +69,10 @@ def add_listing():
         db.session.add(listing)
 
         # flush not commit yet to get new db values for ss update
-        db.session.flush()
+        index_listing(listing)
 
         # spreadsheet update
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_name('client_secret.json', scope)
-        client = gspread.authorize(creds)
-        sheet = client.open("Listings").sheet1
+        sheet = get_listings_sheet()
 
         row = [listing.id, current_user.username, form.listing_date.data.isoformat(), form.source_id.data.description,
                form.description.data, form.name.data, form.email.data, form.address_1.data, form.address_2.data,
@@ -76,9 +82,11 @@ def add_listing():
         sheet.insert_row(row, index)
 
         # add listing to the database
-
+        log_listing_event(listing.id, 'insert')
         db.session.commit()
         flash('You have successfully added a new listing.')
+        if similar:
+            flash('It looks similar to listing(s) {}.'.format(', '.join(str(l.id) for l in similar)))
 
         # redirect to listings page
         return redirect(url_for('admin.list_listings'))
@@ -98,10 +106,16 @@ def edit_listing(id):
     check_admin()
 
     add_listing = False
+    conflict = False
 
     listing = Listing.query.get_or_404(id)
     form = ListingForm(obj=listing)
-    if form.validate_on_submit():
+    submitted = form.validate_on_submit()
+    if submitted:
+        # someone else saved the listing after this form was loaded
+        conflict = form.version.data != str(listing.version)
+
+    if submitted and not conflict:
         listing_date = form.listing_date.data
         listing.source_id = form.source_id.data.id
         listing.description = form.description.data
@@ -114,11 +128,21 @@ def edit_listing(id):
         listing.outgoing = form.outgoing.data
         listing.modified_date = datetime.utcnow()
 
+        # commit before the spreadsheet update so the version check
+        # doesn't hold the row while waiting on the sheet; index_listing
+        # flushes, so the version-checked UPDATE can fail there already
+        try:
+            index_listing(listing)
+            log_listing_event(listing.id, 'update')
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            listing = Listing.query.get_or_404(id)
+            conflict = True
+
+    if submitted and not conflict:
         # spreadsheet update
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_name('client_secret.json', scope)
-        client = gspread.authorize(creds)
-        sheet = client.open("Listings").sheet1
+        sheet = get_listings_sheet()
 
         # find correct row
         cell = sheet.find(str(id), in_column=1)
@@ -128,18 +152,21 @@ def edit_listing(id):
         # insert modified row at same place
 
         row = [listing.id, current_user.username, form.listing_date.data.isoformat(), form.source_id.data.description,
-               form.description.data, form.name.data, form.address_1.data, form.email.data, form.address_2.data,
+               form.description.data, form.name.data, form.email.data, form.address_1.data, form.address_2.data,
                form.post_code.data, form.outgoing.data, json_serial(listing.created_date),
                json_serial(listing.modified_date)]
 
         sheet.insert_row(row, rownum)
 
-        db.session.commit()
         flash('You have successfully edited the listing.')
 
         # redirect to the listings page
         return redirect(url_for('admin.list_listings'))
 
+    if conflict:
+        flash('This listing was changed by someone else while you were editing it. '
+              'The current values are shown below.')
+
     form.description.data = listing.description
     form.name.data = listing.name
     form.email.data = listing.email
@@ -149,9 +176,10 @@ def edit_listing(id):
     form.post_code.data = listing.post_code
     form.outgoing.data = listing.outgoing
     form.source_id.data = listing.source_id
+    form.version.data = listing.version
     return render_template('admin/listings/listing.html', action="Edit",
                            add_listing=add_listing, form=form,
-                           listing=listing, title="Edit Listing")
+                           listing=listing, title="Edit Listing"), 409 if conflict else 200
 
 
 @admin.route('/listings/delete/<int:id>', methods=['GET', 'POST'])
@@ -165,12 +193,19 @@ def delete_listing(id):
     listing = Listing.query.get_or_404(id)
     db.session.delete(listing)
 
+    # commit before the spreadsheet update, as in edit_listing, so an edit
+    # made meanwhile can't leave the row deleted from the sheet only
+    try:
+        log_listing_event(id, 'delete')
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        flash('This listing was changed by someone else, so it was not deleted.')
+        return redirect(url_for('admin.list_listings'))
+
     # delete from ss
 
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name('client_secret.json', scope)
-    client = gspread.authorize(creds)
-    sheet = client.open("Listings").sheet1
+    sheet = get_listings_sheet()
 
     # find correct row
     cell = sheet.find(str(id), in_column=1)
@@ -178,7 +213,6 @@ def delete_listing(id):
     # delete row
     sheet.delete_row(rownum)
 
-    db.session.commit()
     flash('You have successfully deleted the listing.')
 
     # redirect to the listings page
@@ -187,6 +221,70 @@ def delete_listing(id):
     # return render_template(title="Delete Listing")
 
 
+@admin.route('/listings/bulk', methods=['POST'])
+@login_required
+def bulk_listings():
+    """
+    Mark or delete several of the current user's listings at once
+    """
+    check_admin()
+
+    form = BulkListingForm()
+    if not form.validate_on_submit():
+        abort(400)
+
+    ids = []
+    requested = request.form.getlist('listing_ids', type=int)
+    if requested:
+        ids = [listing_id for (listing_id,) in db.session.query(Listing.id).filter(
+            Listing.user_id == current_user.id, Listing.id.in_(requested))]
+    if not ids:
+        flash('No listings were selected.')
+        return redirect(url_for('admin.list_listings'))
+
+    selected = Listing.query.filter(Listing.id.in_(ids))
+    if form.delete.data:
+        action = 'delete'
+        ListingBand.query.filter(ListingBand.listing_id.in_(ids)).delete(synchronize_session=False)
+        selected.delete(synchronize_session=False)
+    else:
+        action = 'update'
+        modified_date = datetime.utcnow()
+        selected.update({Listing.outgoing: True, Listing.modified_date: modified_date,
+                         Listing.version: Listing.version + 1}, synchronize_session=False)
+
+    db.session.execute(ListingEvent.__table__.insert(),
+                       [{'listing_id': listing_id, 'action': action, 'created_date': datetime.utcnow()}
+                        for listing_id in ids])
+    db.session.commit()
+
+    # spreadsheet update, one read of the id column and one write for all rows
+    sheet = get_listings_sheet()
+    id_values = {str(listing_id) for listing_id in ids}
+    rownums = sorted((rownum for rownum, value in enumerate(sheet.col_values(1), start=1) if value in id_values),
+                     reverse=True)
+    if rownums and action == 'delete':
+        # delete from the bottom up so earlier deletes don't shift later rows
+        sheet.spreadsheet.batch_update({'requests': [
+            {'deleteDimension': {'range': {'sheetId': sheet.id, 'dimension': 'ROWS',
+                                           'startIndex': rownum - 1, 'endIndex': rownum}}}
+            for rownum in rownums
+        ]})
+    elif rownums:
+        data = []
+        for rownum in rownums:
+            data.append({'range': 'K{}'.format(rownum), 'values': [[True]]})
+            data.append({'range': 'M{}'.format(rownum), 'values': [[json_serial(modified_date)]]})
+        sheet.batch_update(data)
+
+    if action == 'delete':
+        flash('You have successfully deleted {} listing(s).'.format(len(ids)))
+    else:
+        flash('You have successfully marked {} listing(s) as outgoing.'.format(len(ids)))
+
+    return redirect(url_for('admin.list_listings'))
+
+
 # User Views
 
 @admin.route('/users')
@@ -197,9 +295,33 @@ def list_users():
     """
     check_admin()
 
-    users = User.query.all()
+    search = request.args.get('q', '').strip()
+    after_username = request.args.get('after_username')
+    after_id = request.args.get('after_id', type=int)
+
+    # only the displayed columns, as plain rows rather than User objects
+    query = db.session.query(User.id, User.username, User.first_name, User.last_name,
+                             User.email, User.is_admin)
+    if search:
+        query = query.filter(or_(starts_with(User.username, search, ignore_case=True),
+                                 starts_with(User.email, search, ignore_case=True),
+                                 starts_with(User.first_name, search, ignore_case=True),
+                                 starts_with(User.last_name, search, ignore_case=True)))
+    if after_username is not None and after_id is not None:
+        # the leading >= bounds the ix_user_username range scan
+        query = query.filter(User.username >= after_username,
+                             or_(User.username > after_username, User.id > after_id))
+
+    users = query.order_by(User.username, User.id).limit(USERS_PER_PAGE + 1).all()
+    next_url = None
+    if len(users) > USERS_PER_PAGE:
+        users = users[:USERS_PER_PAGE]
+        next_url = url_for('admin.list_users', q=search or None,
+                           after_username=users[-1].username, after_id=users[-1].id)
+
     return render_template('admin/users/users.html',
-                           users=users, title='Users')
+                           users=users, search=search, next_url=next_url,
+                           paged=after_username is not None, title='Users')
 
 
 @admin.route('/users/add', methods=['GET', 'POST'])
@@ -280,8 +402,12 @@ def delete_user(id):
     check_admin()
 
     user = User.query.get_or_404(id)
+    # the user's listings are kept with user_id set to NULL, which the feed must see
+    listing_ids = [listing_id for listing_id, in db.session.query(Listing.id).filter_by(user_id=id)]
     db.session.delete(user)
 
+    for listing_id in listing_ids:
+        log_listing_event(listing_id, 'update')
     db.session.commit()
     flash('You have successfully deleted the user.')
 
@@ -376,3 +502,56 @@ def delete_listing_source(id):
 
     # redirect to the listing source page
     return redirect(url_for('admin.list_listing_sources'))
+
+
+# Profiles
+
+@admin.route('/profiles')
+@login_required
+def list_profiles():
+    """
+    List the endpoints sampled by the request profiler
+    """
+    check_admin()
+    if not profiler.enabled:
+        abort(404)
+
+    endpoints = sorted(profiler.endpoints().items(), key=lambda item: item[1], reverse=True)
+    return render_template('admin/profiles/profiles.html',
+                           endpoints=endpoints, title="Profiles")
+
+
+@admin.route('/profiles/<name>')
+@login_required
+def download_profile(name):
+    """
+    Download an endpoint's samples as collapsed stacks or speedscope JSON
+    """
+    check_admin()
+    if not profiler.enabled:
+        abort(404)
+
+    if request.args.get('format') == 'speedscope':
+        response = jsonify(profiler.speedscope(name))
+        filename = '{}.speedscope.json'.format(name)
+    else:
+        response = Response(profiler.collapsed(name), mimetype='text/plain')
+        filename = '{}.collapsed.txt'.format(name)
+    response.headers['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
+
+
+@admin.route('/profiles/clear', methods=['POST'])
+@login_required
+def clear_profiles():
+    """
+    Discard all collected samples
+    """
+    check_admin()
+    if not profiler.enabled:
+        abort(404)
+
+    profiler.clear()
+    flash('You have successfully cleared the profiles.')
+
+    return redirect(url_for('admin.list_profiles'))
@@ -0,0 +1,148 @@
+import hmac
+import json
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, abort, current_app, request
+
+from . import api
+from .. import db, throttle
+from ..models import Listing, ListingEvent, starts_with
+from ..utils import json_serial
+
+LISTING_FIELDS = ('id', 'user_id', 'listing_date', 'source_id', 'description', 'name', 'email',
+                  'address_1', 'address_2', 'post_code', 'outgoing', 'created_date', 'modified_date',
+                  'version')
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def token_required(view):
+    """
+    Require one of the configured API tokens as a bearer token
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not any(
+                # compare_digest only accepts ASCII str, so compare the encoded bytes
+                hmac.compare_digest(token.encode('utf-8'), allowed.encode('utf-8'))
+                for allowed in current_app.config['API_TOKENS']):
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def json_response(data):
+    return Response(json.dumps(data, separators=(',', ':'), default=json_serial),
+                    mimetype='application/json')
+
+
+def get_limit():
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if limit < 1:
+        abort(400)
+    return min(limit, MAX_LIMIT)
+
+
+@api.route('/listings/changes')
+@token_required
+def listing_changes():
+    """
+    Return listing events after the ?since cursor, oldest first
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = get_limit()
+
+    columns = [getattr(Listing, field) for field in LISTING_FIELDS]
+    rows = db.session.query(ListingEvent.id, ListingEvent.action, ListingEvent.listing_id, *columns) \
+        .outerjoin(Listing, Listing.id == ListingEvent.listing_id) \
+        .filter(ListingEvent.id > since) \
+        .order_by(ListingEvent.id) \
+        .limit(limit + 1) \
+        .all()
+
+    more = len(rows) > limit
+    events = []
+    for row in rows[:limit]:
+        event = {'seq': row[0], 'action': row[1], 'id': row[2]}
+        # the listing may have been deleted since, so only send its current state if it still exists
+        if row[1] != 'delete' and row[3] is not None:
+            event['listing'] = dict(zip(LISTING_FIELDS, row[3:]))
+        events.append(event)
+
+    return json_response({
+        'cursor': events[-1]['seq'] if events else since,
+        'more': more,
+        'events': events,
+    })
+
+
+def get_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return LISTING_FIELDS
+    fields = tuple(field for field in fields.split(',') if field)
+    if any(field not in LISTING_FIELDS for field in fields):
+        abort(400)
+    # the id is always needed for the next cursor
+    return fields if 'id' in fields else ('id',) + fields
+
+
+def get_date(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400)
+
+
+@api.route('/listings')
+@token_required
+def list_listings():
+    """
+    Return a page of listings in id order, starting after the ?after cursor
+    """
+    after = request.args.get('after', 0, type=int)
+    limit = get_limit()
+    fields = get_fields()
+
+    query = db.session.query(*[getattr(Listing, field) for field in fields]) \
+        .filter(Listing.id > after)
+
+    date_from = get_date('date_from')
+    if date_from is not None:
+        query = query.filter(Listing.listing_date >= date_from)
+    date_to = get_date('date_to')
+    if date_to is not None:
+        query = query.filter(Listing.listing_date <= date_to)
+    source_id = request.args.get('source', type=int)
+    if source_id is not None:
+        query = query.filter(Listing.source_id == source_id)
+    outgoing = request.args.get('outgoing')
+    if outgoing is not None:
+        query = query.filter(Listing.outgoing == (outgoing.lower() in ('1', 'true', 'yes')))
+    post_code = request.args.get('post_code')
+    if post_code:
+        query = query.filter(starts_with(Listing.post_code, post_code.upper()))
+
+    rows = query.order_by(Listing.id).limit(limit + 1).all()
+
+    more = len(rows) > limit
+    listings = [dict(zip(fields, row)) for row in rows[:limit]]
+    return json_response({
+        'next': listings[-1]['id'] if more else None,
+        'listings': listings,
+    })
+
+
+@api.route('/metrics/throttle')
+@token_required
+def throttle_metrics():
+    """
+    Return how many requests each throttle has rejected
+    """
+    return json_response(throttle.metrics())
@@ -0,0 +1,227 @@
+"""
+Fingerprinted, long-cached static assets.
+
+`flask assets-build` downloads the CDN assets into static/vendor, makes
+resized WebP/JPEG variants of the hero image, and copies every static file
+into static/dist under a name containing a hash of its content, with gzip
+and brotli copies alongside.  The mapping
+from logical to hashed names is written to static/dist/manifest.json, which
+url_for('static', ...) consults so templates keep using the logical names.
+Until the build has been run everything is served as before.
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import urllib.request
+
+from flask import request, safe_join, send_file, url_for
+from werkzeug.exceptions import NotFound
+
+BOOTSTRAP_CDN = 'https://maxcdn.bootstrapcdn.com/bootstrap/3.3.7/'
+FONT_AWESOME_CDN = 'https://maxcdn.bootstrapcdn.com/font-awesome/4.7.0/'
+
+# local path under static -> CDN url
+VENDOR_ASSETS = {
+    'vendor/bootstrap/css/bootstrap.min.css': BOOTSTRAP_CDN + 'css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.min.js': BOOTSTRAP_CDN + 'js/bootstrap.min.js',
+    'vendor/font-awesome/css/font-awesome.min.css': FONT_AWESOME_CDN + 'css/font-awesome.min.css',
+    'vendor/jquery/jquery.min.js': 'https://ajax.googleapis.com/ajax/libs/jquery/3.1.1/jquery.min.js',
+}
+for extension in ('eot', 'svg', 'ttf', 'woff', 'woff2'):
+    VENDOR_ASSETS['vendor/bootstrap/fonts/glyphicons-halflings-regular.' + extension] = \
+        BOOTSTRAP_CDN + 'fonts/glyphicons-halflings-regular.' + extension
+    VENDOR_ASSETS['vendor/font-awesome/fonts/fontawesome-webfont.' + extension] = \
+        FONT_AWESOME_CDN + 'fonts/fontawesome-webfont.' + extension
+
+HERO_IMAGE = 'img/Seaview2.jpg'
+HERO_WIDTHS = (480, 960, 1440)
+HERO_FORMATS = {'webp': ('WEBP', {'quality': 75, 'method': 6}),
+                'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True})}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.eot', '.ttf', '.ico', '.json')
+ONE_YEAR = 365 * 24 * 60 * 60
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def hashed_name(path, content):
+    root, extension = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha1(content).hexdigest()[:10], extension)
+
+
+def download_vendor_assets(static_folder, echo=print):
+    for path, url in sorted(VENDOR_ASSETS.items()):
+        target = os.path.join(static_folder, path)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        echo('Downloading {}'.format(url))
+        # a failed download must not leave a partial file that is skipped next time
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+        try:
+            with urllib.request.urlopen(url) as response, os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(response, f)
+            os.replace(partial, target)
+        except BaseException:
+            os.remove(partial)
+            raise
+
+
+def hero_variants(static_folder):
+    """
+    Yield (logical path, content) for each resized variant of the hero image
+    """
+    from PIL import Image
+
+    with Image.open(os.path.join(static_folder, HERO_IMAGE)) as original:
+        original = original.convert('RGB')
+        root = posixpath.splitext(HERO_IMAGE)[0]
+        # never upscale, but always make one variant at the original width
+        widths = sorted({min(width, original.width) for width in HERO_WIDTHS})
+        for width in widths:
+            image = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+            for extension, (image_format, options) in HERO_FORMATS.items():
+                buffer = io.BytesIO()
+                image.save(buffer, image_format, **options)
+                yield '{}-{}.{}'.format(root, width, extension), buffer.getvalue()
+
+
+def rewrite_css_urls(path, content, manifest):
+    """
+    Point url() references of a stylesheet at the hashed files
+    """
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        target, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, target))
+        if target not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[target], posixpath.join(DIST, directory))
+        return 'url({0}{1}{2}{0})'.format(quote, hashed, suffix)
+
+    return _CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def precompress(target):
+    import brotli
+
+    with open(target, 'rb') as f:
+        content = f.read()
+    with gzip.open(target + '.gz', 'wb', compresslevel=9) as f:
+        f.write(content)
+    with open(target + '.br', 'wb') as f:
+        f.write(brotli.compress(content))
+
+
+def build_assets(static_folder, download=True, echo=print):
+    """
+    Write hashed copies of the static files to static/dist and return the manifest
+    """
+    if download:
+        download_vendor_assets(static_folder, echo)
+
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    files = {}
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        subdirectories[:] = [d for d in subdirectories
+                             if os.path.join(directory, d) != dist]
+        for filename in filenames:
+            source = os.path.join(directory, filename)
+            with open(source, 'rb') as f:
+                files[os.path.relpath(source, static_folder).replace(os.sep, '/')] = f.read()
+    if os.path.exists(os.path.join(static_folder, HERO_IMAGE)):
+        files.update(hero_variants(static_folder))
+
+    # stylesheets last, so the files they reference already have hashed names
+    manifest = {}
+    for path in sorted(files, key=lambda path: (path.endswith('.css'), path)):
+        content = files[path]
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content, manifest)
+        manifest[path] = posixpath.join(DIST, hashed_name(path, content))
+
+        target = os.path.join(static_folder, manifest[path])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if path.endswith(COMPRESSIBLE):
+            precompress(target)
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    echo('Wrote {} asset(s) to {}'.format(len(manifest), dist))
+    return manifest
+
+
+def init_assets(app):
+    """
+    Serve hashed assets from the manifest when one has been built
+    """
+    dist = os.path.join(app.static_folder, DIST)
+    try:
+        with open(os.path.join(dist, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    @app.url_defaults
+    def hashed_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def static_dist(filename):
+        path = safe_join(dist, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in request.accept_encodings and os.path.isfile(path + suffix):
+                response = send_file(path + suffix, conditional=True,
+                                     mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_file(path, conditional=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        # the name changes whenever the content does
+        response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(ONE_YEAR)
+        return response
+
+    app.add_url_rule(app.static_url_path + '/' + DIST + '/<path:filename>', 'static_dist', static_dist)
+
+    def static_or_cdn(path):
+        """
+        URL of a vendored asset, or its CDN URL before the build has run
+        """
+        if path in manifest:
+            return url_for('static', filename=path)
+        return VENDOR_ASSETS[path]
+
+    hero_pattern = re.compile(re.escape(posixpath.splitext(HERO_IMAGE)[0]) + r'-(\d+)\.(\w+)$')
+    hero = {}
+    for path in manifest:
+        match = hero_pattern.match(path)
+        if match:
+            hero.setdefault(match.group(2), []).append((int(match.group(1)), path))
+
+    def hero_srcset(extension):
+        return ', '.join('{} {}w'.format(url_for('static', filename=path), width)
+                         for width, path in sorted(hero.get(extension, [])))
+
+    app.jinja_env.globals.update(static_or_cdn=static_or_cdn, hero_srcset=hero_srcset,
+                                 hero_image=HERO_IMAGE)
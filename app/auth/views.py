@@ -3,11 +3,12 @@ from flask_login import login_required, login_user, logout_user
 
 from . import auth
 from app.auth.forms import LoginForm, RegistrationForm
-from .. import db
+from .. import db, throttle
 from ..models import User
 
 
 @auth.route('/register', methods=['GET', 'POST'])
+@throttle.limit('register')
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
@@ -30,6 +31,7 @@ def register():
 
 
 @auth.route('/login', methods=['GET', 'POST'])
+@throttle.limit('login')
 def login():
     form = LoginForm()
     if form.validate_on_submit():
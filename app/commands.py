@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app import db
+from .assets import build_assets
+from .dedupe import exact_duplicate_groups, index_listing, similar_pairs
+from .models import Listing
+from .sheets import SnapshotMissing, get_listings_sheet, pull_listings, record_snapshot
+
+
+@click.command('dedupe-scan')
+@click.option('--reindex/--no-reindex', default=True,
+              help='Rebuild fingerprints and LSH bands before scanning.')
+@click.option('--batch-size', default=500, show_default=True)
+@with_appcontext
+def dedupe_scan(reindex, batch_size):
+    """
+    Report duplicate and near-duplicate listings
+    """
+    if reindex:
+        last_id = 0
+        while True:
+            batch = Listing.query.filter(Listing.id > last_id).order_by(Listing.id).limit(batch_size).all()
+            if not batch:
+                break
+            for listing in batch:
+                index_listing(listing)
+            db.session.commit()
+            last_id = batch[-1].id
+            click.echo('Indexed listings up to {}'.format(last_id))
+
+    groups = exact_duplicate_groups()
+    for ids in groups:
+        click.echo('Exact duplicates: {}'.format(', '.join(str(i) for i in ids)))
+
+    pairs = similar_pairs()
+    for first, second, similarity in pairs:
+        click.echo('Similar: {} and {} ({:.0%})'.format(first, second, similarity))
+
+    click.echo('{} duplicate group(s), {} similar pair(s)'.format(len(groups), len(pairs)))
+
+
+# Run in a fresh interpreter so nothing is imported yet
+STARTUP_SCRIPT = '''
+import json, sys, time
+timings = []
+def step(name, func):
+    start = time.perf_counter()
+    result = func()
+    timings.append((name, time.perf_counter() - start))
+    return result
+step('import flask and extensions', lambda: [__import__(m) for m in (
+    'flask', 'flask_bootstrap', 'flask_login', 'flask_migrate', 'flask_sqlalchemy', 'flask_wtf')])
+app_module = step('import app', lambda: __import__('app'))
+app = step('create_app', app_module.create_app)
+step('precompile templates', lambda: app_module.precompile_templates(app))
+step('connect to database', lambda: app.app_context().push() or app_module.db.engine.connect().close())
+step('import sheet stack (deferred)', lambda: [__import__(m) for m in (
+    'gspread', 'oauth2client.service_account')])
+print(json.dumps(timings))
+'''
+
+
+@click.command('startup-profile')
+@click.option('--imports', default=15, show_default=True,
+              help='Number of slowest top-level imports to list.')
+def startup_profile(imports):
+    """
+    Break down import and initialization time of a cold start
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise click.ClickException(result.stderr.strip().splitlines()[-1])
+
+    click.echo('Startup phases:')
+    for name, seconds in json.loads(result.stdout.strip().splitlines()[-1]):
+        click.echo('  {:<32} {:>8.1f} ms'.format(name, seconds * 1000))
+
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith(' ') or name[1:2] == ' ':
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative)
+
+    click.echo('Slowest top-level imports:')
+    for package, micros in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:imports]:
+        click.echo('  {:<32} {:>8.1f} ms'.format(package, micros / 1000))
+
+
+@click.command('sheet-pull')
+@click.option('--chunk-size', default=500, show_default=True,
+              help='Rows fetched per sheet request.')
+@click.option('--interval', type=int,
+              help='Keep running, pulling every INTERVAL seconds.')
+@click.option('--init', is_flag=True,
+              help='Only record the current rows as the baseline; run once before the first pull.')
+@with_appcontext
+def sheet_pull(chunk_size, interval, init):
+    """
+    Apply manual edits in the Listings sheet to the database
+    """
+    if init:
+        count = record_snapshot(get_listings_sheet(), chunk_size)
+        click.echo('{} row(s) recorded as the baseline'.format(count))
+        return
+
+    while True:
+        try:
+            stats = pull_listings(get_listings_sheet(), chunk_size)
+        except SnapshotMissing as e:
+            raise click.ClickException(str(e))
+        finally:
+            # don't carry a transaction, and its snapshot of the listings, into the next pull
+            db.session.remove()
+        click.echo('{applied} row(s) applied, {conflicts} conflict(s) kept from the database, '
+                   '{repaired} repaired, {unchanged} unchanged'.format(**stats))
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+@click.command('assets-build')
+@click.option('--download/--no-download', default=True,
+              help='Fetch missing CDN assets into static/vendor first.')
+@with_appcontext
+def assets_build(download):
+    """
+    Write content-hashed, precompressed static assets and their manifest
+    """
+    build_assets(current_app.static_folder, download, echo=click.echo)
+    click.echo('Restart the app to serve the new manifest.')
+
+
+def register_commands(app):
+    app.cli.add_command(dedupe_scan)
+    app.cli.add_command(startup_profile)
+    app.cli.add_command(sheet_pull)
+    app.cli.add_command(assets_build)
@@ -0,0 +1,160 @@
+"""
+Duplicate and near-duplicate detection for listings.
+
+Exact duplicates share a fingerprint built from the normalized name, post code
+and listing date.  Near duplicates are found with MinHash signatures of the
+description, split into LSH bands that are stored in the listing_band table so
+candidates can be looked up through an index instead of scanning every listing.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import aliased
+
+from app import db
+from .models import Listing, ListingBand
+
+SHINGLE_SIZE = 4
+NUM_BANDS = 10
+ROWS_PER_BAND = 3
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+SIMILARITY_THRESHOLD = 0.6
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(1717)
+_PERMUTATIONS = [(_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+                 for _ in range(NUM_PERM)]
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(text):
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def listing_fingerprint(name, post_code, listing_date):
+    """
+    Return a hash identifying a listing by its name, post code and date
+    """
+    parts = [
+        normalize_text(name),
+        (post_code or '').replace(' ', '').upper(),
+        listing_date.isoformat() if listing_date else '',
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def shingles(text):
+    text = normalize_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set):
+    """
+    Return the MinHash signature of a set of shingles
+    """
+    hashes = [struct.unpack('<I', hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest())[0]
+              for s in shingle_set]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in _PERMUTATIONS]
+
+
+def band_buckets(description):
+    """
+    Return (band, bucket) pairs for the LSH index of a description
+    """
+    shingle_set = shingles(description)
+    if not shingle_set:
+        return []
+    signature = minhash(shingle_set)
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack('<%dI' % ROWS_PER_BAND, *rows), digest_size=8)
+        buckets.append((band, digest.hexdigest()))
+    return buckets
+
+
+def index_listing(listing):
+    """
+    Update the fingerprint and LSH bands of a listing, flushing it if needed
+    """
+    listing.fingerprint = listing_fingerprint(listing.name, listing.post_code, listing.listing_date)
+    # the bands need the listing id
+    db.session.flush()
+    ListingBand.query.filter_by(listing_id=listing.id).delete(synchronize_session=False)
+    db.session.add_all([ListingBand(listing_id=listing.id, band=band, bucket=bucket)
+                        for band, bucket in band_buckets(listing.description)])
+
+
+def find_exact_duplicate(name, post_code, listing_date, exclude_id=None):
+    query = Listing.query.filter_by(fingerprint=listing_fingerprint(name, post_code, listing_date))
+    if exclude_id is not None:
+        query = query.filter(Listing.id != exclude_id)
+    return query.first()
+
+
+def find_similar(description, exclude_id=None):
+    """
+    Return listings whose description is close to the given one
+    """
+    buckets = band_buckets(description)
+    if not buckets:
+        return []
+    candidate_ids = db.session.query(ListingBand.listing_id).filter(
+        tuple_(ListingBand.band, ListingBand.bucket).in_(buckets))
+    if exclude_id is not None:
+        candidate_ids = candidate_ids.filter(ListingBand.listing_id != exclude_id)
+    candidates = Listing.query.filter(Listing.id.in_(candidate_ids.distinct())).all()
+
+    target = shingles(description)
+    return [listing for listing in candidates
+            if jaccard(target, shingles(listing.description)) >= SIMILARITY_THRESHOLD]
+
+
+def exact_duplicate_groups():
+    """
+    Return lists of listing ids sharing a fingerprint
+    """
+    duplicated = db.session.query(Listing.fingerprint).filter(Listing.fingerprint.isnot(None)) \
+        .group_by(Listing.fingerprint).having(func.count(Listing.id) > 1)
+    groups = {}
+    for fingerprint, listing_id in db.session.query(Listing.fingerprint, Listing.id) \
+            .filter(Listing.fingerprint.in_(duplicated)).order_by(Listing.id):
+        groups.setdefault(fingerprint, []).append(listing_id)
+    return list(groups.values())
+
+
+def similar_pairs():
+    """
+    Return (id, id, similarity) for listings sharing an LSH bucket
+    """
+    other = aliased(ListingBand)
+    pairs = db.session.query(ListingBand.listing_id, other.listing_id) \
+        .join(other, (ListingBand.band == other.band) & (ListingBand.bucket == other.bucket)) \
+        .filter(ListingBand.listing_id < other.listing_id).distinct().all()
+    if not pairs:
+        return []
+
+    ids = {listing_id for pair in pairs for listing_id in pair}
+    descriptions = {listing_id: shingles(description) for listing_id, description in
+                    db.session.query(Listing.id, Listing.description).filter(Listing.id.in_(ids))}
+    results = []
+    for first, second in pairs:
+        similarity = jaccard(descriptions[first], descriptions[second])
+        if similarity >= SIMILARITY_THRESHOLD:
+            results.append((first, second, similarity))
+    return results
@@ -1,6 +1,6 @@
 from flask_login import UserMixin, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.sql import case
+from sqlalchemy.sql import and_, case
 # from sqlalchemy.orm import column_property
 from sqlalchemy.ext.hybrid import hybrid_property
 from app import db, login_manager
@@ -93,10 +93,15 @@ class Listing(db.Model):
     email = db.Column(db.String(40))
     address_1 = db.Column(db.String(50))
     address_2 = db.Column(db.String(50))
-    post_code = db.Column(db.String(10))    
+    post_code = db.Column(db.String(10), index=True)
     outgoing = db.Column(db.Boolean, default=False)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     modified_date= db.Column(db.DateTime, default=datetime.utcnow)
+    fingerprint = db.Column(db.String(40), index=True)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    bands = db.relationship('ListingBand', cascade='all, delete-orphan', lazy='dynamic')
+
+    __mapper_args__ = {'version_id_col': version}
     source_name = db.column_property(
         db.select(
             [ListingSource.description],
@@ -121,5 +126,68 @@ class Listing(db.Model):
         ], else_ = cls.address_1 + ", " + cls.post_code)     
 
 
+class ListingBand(db.Model):
+    """
+    LSH bucket of a listing description, used to find near duplicates
+    """
+    __table_args__ = (
+        db.Index('ix_listing_band_band_bucket', 'band', 'bucket'),
+        {'mysql_engine':'InnoDB', 'mysql_charset':'utf8','mysql_collate':'utf8_general_ci'}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id', ondelete='CASCADE'), index=True)
+    band = db.Column(db.SmallInteger)
+    bucket = db.Column(db.String(16))
+
+
+class ListingEvent(db.Model):
+    """
+    Append-only log of listing changes, read by the changes feed
+    """
+    __table_args__ = {'mysql_engine':'InnoDB', 'mysql_charset':'utf8','mysql_collate':'utf8_general_ci'}
+
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(6), nullable=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return '<ListingEvent {} {} {}>'.format(self.id, self.action, self.listing_id)
+
+
+class SheetRow(db.Model):
+    """
+    Hash of a listing's spreadsheet row as of the last sheet pull
+    """
+    __table_args__ = {'mysql_engine':'InnoDB', 'mysql_charset':'utf8','mysql_collate':'utf8_general_ci'}
+
+    listing_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    row_hash = db.Column(db.String(40), nullable=False)
+
+
+def log_listing_event(listing_id, action):
+    """
+    Record an insert, update or delete of a listing in the current transaction.
+
+    Call it last, right before the commit: the feed pages by event id, so an
+    id allocated early in a long transaction could commit after later ids
+    have already been read past.
+    """
+    db.session.add(ListingEvent(listing_id=listing_id, action=action))
+
+
 def get_listing_sources():
     return ListingSource.query.order_by(ListingSource.description)          
+
+
+def starts_with(column, prefix, ignore_case=False):
+    """
+    Prefix match written as a range, so an index on the column can be used.
+
+    MySQL's utf8_general_ci collation already ignores case; on SQLite
+    ignore_case compares with NOCASE, which the *_nocase indexes serve.
+    """
+    if ignore_case and db.engine.dialect.name == 'sqlite':
+        column = column.collate('NOCASE')
+    return and_(column >= prefix, column < prefix + '\uffff')
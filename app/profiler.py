@@ -0,0 +1,162 @@
+"""
+Opt-in sampling profiler for requests.
+
+A sample of requests (plus requests from admins carrying the profiling
+header) have their thread's stack sampled by a background thread at a fixed
+interval.  Stacks are aggregated per endpoint and can be downloaded as
+collapsed stacks (for flamegraph.pl and friends) or speedscope JSON.  Nothing
+is registered when PROFILER_ENABLED is off, so it costs nothing then.
+"""
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request
+from flask_login import current_user
+
+TRUNCATED = (('', '[truncated]', 0),)
+
+
+class RequestProfiler(object):
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._active = {}
+        self._stacks = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_ENABLED', False)
+        app.config.setdefault('PROFILER_SAMPLE_RATE', 0.01)
+        app.config.setdefault('PROFILER_INTERVAL', 0.005)
+        app.config.setdefault('PROFILER_HEADER', 'X-Profile')
+        app.config.setdefault('PROFILER_MAX_STACKS', 5000)
+
+        self.enabled = app.config['PROFILER_ENABLED']
+        if not self.enabled:
+            return
+
+        self.sample_rate = app.config['PROFILER_SAMPLE_RATE']
+        self.interval = app.config['PROFILER_INTERVAL']
+        self.header = app.config['PROFILER_HEADER']
+        self.max_stacks = app.config['PROFILER_MAX_STACKS']
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    def _wanted(self):
+        if random.random() < self.sample_rate:
+            return True
+        # only admins may ask for a profile, as it adds overhead to their request
+        return self.header in request.headers and current_user.is_authenticated and current_user.is_admin
+
+    def _start(self):
+        if request.endpoint is None or request.endpoint == 'static' or not self._wanted():
+            return
+        with self._lock:
+            self._active[threading.get_ident()] = request.endpoint
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _stop(self, exc=None):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for ident, endpoint in active.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._record(endpoint, frame)
+            del frames
+            time.sleep(self.interval)
+
+    def _record(self, endpoint, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+            frame = frame.f_back
+        stack = tuple(reversed(stack))
+        with self._lock:
+            counts = self._stacks.setdefault(endpoint, Counter())
+            if stack not in counts and len(counts) >= self.max_stacks:
+                stack = TRUNCATED
+            counts[stack] += 1
+
+    def endpoints(self):
+        """
+        Return {endpoint: number of samples}
+        """
+        with self._lock:
+            return {endpoint: sum(counts.values()) for endpoint, counts in self._stacks.items()}
+
+    def stacks(self, endpoint):
+        with self._lock:
+            return Counter(self._stacks.get(endpoint, ()))
+
+    def clear(self):
+        with self._lock:
+            self._stacks = {}
+
+    @staticmethod
+    def frame_name(frame):
+        filename, name, line = frame
+        return '{} ({}:{})'.format(name, filename, line) if filename else name
+
+    def collapsed(self, endpoint):
+        """
+        Return the endpoint's samples in collapsed-stack format
+        """
+        lines = ['{} {}'.format(';'.join(self.frame_name(frame).replace(';', ':') for frame in stack), count)
+                 for stack, count in self.stacks(endpoint).most_common()]
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, endpoint):
+        """
+        Return the endpoint's samples as a speedscope profile
+        """
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks(endpoint).items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    filename, name, line = frame
+                    frames.append({'name': name, 'file': filename, 'line': line})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count * self.interval * 1000)
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': endpoint,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': endpoint,
+            'exporter': 'free_stuff request profiler',
+        }
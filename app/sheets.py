@@ -0,0 +1,243 @@
+"""
+Access to the "Listings" Google Sheet.
+
+gspread and oauth2client are imported on first use, so workers that never
+touch the sheet don't pay for importing them.
+"""
+import hashlib
+from datetime import date, datetime
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from .dedupe import index_listing
+from .models import Listing, ListingSource, SheetRow, log_listing_event
+
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+# sheet columns A to M, as written by the admin views
+COLUMNS = ('id', 'username', 'listing_date', 'source', 'description', 'name', 'email',
+           'address_1', 'address_2', 'post_code', 'outgoing', 'created_date', 'modified_date')
+TEXT_COLUMNS = ('description', 'name', 'email', 'address_1', 'address_2', 'post_code')
+
+
+def get_listings_sheet():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    creds = ServiceAccountCredentials.from_json_keyfile_name('client_secret.json', SCOPE)
+    client = gspread.authorize(creds)
+    return client.open("Listings").sheet1
+
+
+def row_hash(values):
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+
+def read_rows(sheet, chunk_size):
+    """
+    Yield (row number, values) for each data row, chunk_size rows per request
+    """
+    first = 2
+    while first <= sheet.row_count:
+        last = first + chunk_size - 1
+        for offset, values in enumerate(sheet.get('A{}:M{}'.format(first, last))):
+            yield first + offset, values + [''] * (len(COLUMNS) - len(values))
+        first = last + 1
+
+
+def parse_datetime(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def listing_changes(listing, row, sources):
+    """
+    Return the attributes of listing that differ from its sheet row
+    """
+    # post codes are stored upper-cased
+    row = dict(row, post_code=row['post_code'].upper())
+    changes = {}
+    for column in TEXT_COLUMNS:
+        if (getattr(listing, column) or '') != row[column]:
+            changes[column] = row[column]
+
+    listing_date = parse_datetime(row['listing_date'])
+    if listing_date is not None and listing_date.date() != listing.listing_date:
+        changes['listing_date'] = listing_date.date()
+
+    source_id = sources.get(row['source'])
+    if source_id is not None and source_id != listing.source_id:
+        changes['source_id'] = source_id
+
+    outgoing = row['outgoing'].upper() == 'TRUE'
+    if outgoing != bool(listing.outgoing):
+        changes['outgoing'] = outgoing
+    return changes
+
+
+# sheet_row entry written by record_snapshot, as listing ids start at 1
+BASELINE_ID = 0
+
+
+class SnapshotMissing(Exception):
+    """
+    No baseline has been recorded yet, so edits can't be told apart
+    """
+
+
+def record_snapshot(sheet, chunk_size=500):
+    """
+    Store the hash of every sheet row without applying anything.
+
+    Run once before the first pull: rows older than the snapshot may still
+    be in the column order earlier versions of the admin views wrote.
+    Returns the number of rows recorded.
+    """
+    snapshot = {listing_id for listing_id, in db.session.query(SheetRow.listing_id)}
+    hashes = {int(values[0]): row_hash(values) for _, values in read_rows(sheet, chunk_size)
+              if values[0].isdigit()}
+    count = len(hashes)
+    # recorded even for an empty sheet, so pulls can start
+    hashes[BASELINE_ID] = ''
+    save_hashes(hashes, snapshot)
+    db.session.commit()
+    return count
+
+
+def save_hashes(hashes, snapshot):
+    db.session.bulk_insert_mappings(SheetRow, [{'listing_id': listing_id, 'row_hash': value}
+                                               for listing_id, value in hashes.items()
+                                               if listing_id not in snapshot])
+    db.session.bulk_update_mappings(SheetRow, [{'listing_id': listing_id, 'row_hash': value}
+                                               for listing_id, value in hashes.items()
+                                               if listing_id in snapshot])
+
+
+def cell_value(value):
+    """
+    Return a value as the sheet reads it back after a RAW write
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def database_row(listing, values, source_names):
+    """
+    Return the sheet row for a listing, keeping the id and username cells
+    """
+    return values[:2] + [cell_value(value) for value in (
+        listing.listing_date, source_names.get(listing.source_id), listing.description, listing.name,
+        listing.email, listing.address_1, listing.address_2, listing.post_code, bool(listing.outgoing),
+        listing.created_date, listing.modified_date)]
+
+
+def in_old_order(listing, row):
+    """
+    Whether the row has address_1 in the email column and vice versa, as
+    edit_listing used to write it
+    """
+    email, address_1 = listing.email or '', listing.address_1 or ''
+    return row['email'] != email and row['email'] == address_1 and row['address_1'] != address_1
+
+
+def pull_listings(sheet, chunk_size=500):
+    """
+    Apply rows edited in the sheet since the last pull to their listings.
+
+    Only rows whose hash differs from the stored snapshot are compared with
+    the database.  When the listing was modified after the time in the row's
+    modified column, the database copy wins and is written back over the
+    row; a listing saved while the pull runs is left for the next one.  Rows
+    in the old email/address column order are put back in the current order
+    first.  Returns counts of applied, conflicting, repaired and unchanged
+    rows.
+    """
+    snapshot = dict(db.session.query(SheetRow.listing_id, SheetRow.row_hash))
+    if BASELINE_ID not in snapshot:
+        raise SnapshotMissing('No baseline recorded yet, run "flask sheet-pull --init" first')
+
+    changed = []
+    for rownum, values in read_rows(sheet, chunk_size):
+        if not values[0].isdigit():
+            continue
+        listing_id = int(values[0])
+        if snapshot.get(listing_id) != row_hash(values):
+            changed.append((rownum, listing_id, values))
+
+    stats = {'applied': 0, 'conflicts': 0, 'repaired': 0, 'unchanged': 0}
+    if not changed:
+        return stats
+
+    source_names = dict(db.session.query(ListingSource.id, ListingSource.description))
+    sources = {description: source_id for source_id, description in source_names.items()}
+    listings = {}
+    ids = [listing_id for _, listing_id, _ in changed]
+    for start in range(0, len(ids), chunk_size):
+        listings.update((listing.id, listing) for listing in
+                        Listing.query.filter(Listing.id.in_(ids[start:start + chunk_size])))
+
+    now = datetime.utcnow()
+    hashes = {}
+    cells = []
+    applied = []
+    email_column = COLUMNS.index('email')
+    for rownum, listing_id, values in changed:
+        listing = listings.get(listing_id)
+        if listing is None:
+            continue
+        row = dict(zip(COLUMNS, values))
+        if in_old_order(listing, row):
+            values = list(values)
+            values[email_column:email_column + 2] = row['address_1'], row['email']
+            row = dict(zip(COLUMNS, values))
+            cells.append({'range': 'G{0}:H{0}'.format(rownum), 'values': [[row['email'], row['address_1']]]})
+            stats['repaired'] += 1
+        changes = listing_changes(listing, row, sources)
+        sheet_modified = parse_datetime(row['modified_date'])
+
+        if not changes:
+            stats['unchanged'] += 1
+        elif sheet_modified is None or (listing.modified_date and sheet_modified < listing.modified_date):
+            values = database_row(listing, values, source_names)
+            cells.append({'range': 'A{0}:M{0}'.format(rownum), 'values': [values]})
+            stats['conflicts'] += 1
+        else:
+            # an admin may have saved the listing since it was loaded; the
+            # savepoint limits the version conflict to this row
+            savepoint = db.session.begin_nested()
+            try:
+                for attribute, value in changes.items():
+                    setattr(listing, attribute, value)
+                listing.modified_date = now
+                index_listing(listing)
+                savepoint.commit()
+            except StaleDataError:
+                savepoint.rollback()
+                # not snapshotted, so the next run compares it again
+                stats['conflicts'] += 1
+                continue
+            applied.append(listing_id)
+
+            # keep the sheet's modified column in step so later edits aren't seen as stale
+            values = values[:COLUMNS.index('modified_date')] + [now.isoformat()]
+            cells.append({'range': 'M{}'.format(rownum), 'values': [[now.isoformat()]]})
+            stats['applied'] += 1
+        hashes[listing_id] = row_hash(values)
+
+    save_hashes(hashes, snapshot)
+    # events last, so their ids are allocated right before the commit
+    for listing_id in applied:
+        log_listing_event(listing_id, 'update')
+    db.session.commit()
+
+    if cells:
+        sheet.batch_update(cells)
+    return stats
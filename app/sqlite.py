@@ -0,0 +1,39 @@
+"""
+Opt-in tuning for SQLite databases served by several worker processes.
+
+WAL journaling lets readers carry on while a writer commits, and the busy
+timeout makes a blocked writer wait for the lock instead of failing with
+"database is locked".
+"""
+from sqlalchemy import event
+
+from app import db
+
+
+def sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA busy_timeout={:d}'.format(config['SQLITE_BUSY_TIMEOUT']),
+        'PRAGMA mmap_size={:d}'.format(config['SQLITE_MMAP_SIZE']),
+        'PRAGMA cache_size={:d}'.format(config['SQLITE_CACHE_SIZE']),
+    ]
+
+
+def init_sqlite_profile(app):
+    """
+    Apply the pragmas to every new connection of the app's SQLite engine
+    """
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', on_connect)
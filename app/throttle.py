@@ -0,0 +1,141 @@
+"""
+Sliding-window throttling of expensive endpoints such as login.
+
+Each key (an IP address or an email) keeps a count for the current and the
+previous fixed window; the previous count is weighted by how much of it still
+overlaps the sliding window.  Counts live in process memory by default, or in
+Redis when THROTTLE_STORAGE_URL points at one so that all workers share them.
+Behind a reverse proxy, set PROXY_COUNT so the IP limit applies to the client
+address rather than the proxy's.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import abort, current_app, request
+
+
+class MemoryBackend(object):
+    """
+    Per-process counters
+    """
+    # drop expired keys once this many have been added
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._metrics = {}
+        self._added = 0
+
+    def hit(self, key, window, now):
+        index, offset = divmod(now, window)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                self._added += 1
+                current, previous = 0, 0
+            else:
+                last, current, previous = entry
+                if last == index - 1:
+                    current, previous = 0, current
+                elif last != index:
+                    current, previous = 0, 0
+            self._windows[key] = (index, current + 1, previous)
+
+            if self._added >= self.SWEEP_EVERY:
+                self._added = 0
+                self._windows = {k: v for k, v in self._windows.items() if v[0] >= index - 1}
+
+        return previous * (1 - offset / window) + current + 1
+
+    def incr_metric(self, name):
+        with self._lock:
+            self._metrics[name] = self._metrics.get(name, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+
+class RedisBackend(object):
+    """
+    Counters shared by every worker through Redis
+    """
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    def hit(self, key, window, now):
+        index, offset = divmod(now, window)
+        current = 'throttle:{}:{:d}'.format(key, int(index))
+        previous = 'throttle:{}:{:d}'.format(key, int(index) - 1)
+
+        pipe = self._redis.pipeline()
+        pipe.incr(current)
+        pipe.expire(current, int(window * 2))
+        pipe.get(previous)
+        count, _, previous_count = pipe.execute()
+        return int(previous_count or 0) * (1 - offset / window) + count
+
+    def incr_metric(self, name):
+        self._redis.hincrby('throttle:metrics', name, 1)
+
+    def metrics(self):
+        return {name.decode(): int(count) for name, count in self._redis.hgetall('throttle:metrics').items()}
+
+
+class Throttle(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('THROTTLE_ENABLED', True)
+        app.config.setdefault('THROTTLE_WINDOW', 300)
+        app.config.setdefault('THROTTLE_IP_LIMIT', 30)
+        app.config.setdefault('THROTTLE_EMAIL_LIMIT', 10)
+        app.config.setdefault('THROTTLE_STORAGE_URL', None)
+
+        url = app.config['THROTTLE_STORAGE_URL']
+        self.backend = RedisBackend(url) if url else MemoryBackend()
+
+    def exceeded(self, scope):
+        """
+        Count this request against its IP and email and check the limits
+        """
+        config = current_app.config
+        window = config['THROTTLE_WINDOW']
+        now = time.time()
+
+        keys = [('ip', request.remote_addr or '', config['THROTTLE_IP_LIMIT'])]
+        email = (request.form.get('email') or '').strip().lower()
+        if email:
+            keys.append(('email', email, config['THROTTLE_EMAIL_LIMIT']))
+
+        for kind, value, limit in keys:
+            if self.backend.hit('{}:{}:{}'.format(scope, kind, value), window, now) > limit:
+                self.backend.incr_metric('{}.{}'.format(scope, kind))
+                return True
+        return False
+
+    def limit(self, scope):
+        """
+        Reject POSTs to the view with 429 once a limit is reached, before the
+        view does any work
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method == 'POST' and current_app.config['THROTTLE_ENABLED'] \
+                        and self.exceeded(scope):
+                    abort(429)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        return self.backend.metrics()
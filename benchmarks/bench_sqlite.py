@@ -0,0 +1,101 @@
+"""
+Mixed read/write throughput of the SQLite database under N concurrent
+worker processes, with the SQLite tuning profile on and off.
+
+    python benchmarks/bench_sqlite.py --workers 1 2 4 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_app(url, tuning):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        SQLITE_TUNING = tuning
+
+    return create_app(BenchConfig)
+
+
+def create_database(tuning):
+    from app import db
+    from app.models import ListingSource, User
+
+    url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    with make_app(url, tuning).app_context():
+        db.create_all()
+        db.session.add_all([User(username='bench', email='bench@example.com'),
+                            ListingSource(description='Benchmark')])
+        db.session.commit()
+    return url
+
+
+def worker(url, tuning, write_ratio, duration, results):
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    from app.models import Listing
+
+    reads = writes = errors = 0
+    rng = random.Random(os.getpid())
+    with make_app(url, tuning).app_context():
+        stop = time.perf_counter() + duration
+        while time.perf_counter() < stop:
+            try:
+                if rng.random() < write_ratio:
+                    db.session.add(Listing(user_id=1, source_id=1, listing_date=date.today(),
+                                           name='Bench', description='Benchmark listing'))
+                    db.session.commit()
+                    writes += 1
+                else:
+                    Listing.query.filter_by(user_id=1).order_by(Listing.id.desc()).limit(20).all()
+                    db.session.rollback()
+                    reads += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(workers, tuning, args):
+    url = create_database(tuning)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker,
+                                         args=(url, tuning, args.write_ratio, args.duration, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    totals = [sum(counts) for counts in zip(*[results.get() for _ in processes])]
+    for process in processes:
+        process.join()
+
+    reads, writes, errors = totals
+    print('{:>7} {:>7} {:>10.1f} {:>10.1f} {:>7}'.format(
+        workers, 'on' if tuning else 'off', reads / args.duration, writes / args.duration, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print('{:>7} {:>7} {:>10} {:>10} {:>7}'.format('workers', 'tuning', 'reads/s', 'writes/s', 'errors'))
+    for workers in args.workers:
+        for tuning in (False, True):
+            run(workers, tuning, args)
+
+
+if __name__ == '__main__':
+    main()
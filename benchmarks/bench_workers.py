@@ -0,0 +1,108 @@
+"""
+Time-to-first-request and steady-state throughput of the gunicorn
+deployment as the number of workers grows.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --duration 10
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_database():
+    """
+    Create an empty schema in a throwaway SQLite database and return its URL
+    """
+    url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = url
+    sys.path.insert(0, ROOT)
+    from app import create_app, db
+
+    with create_app().app_context():
+        db.create_all()
+    return url
+
+
+def wait_for_first_response(url, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.01)
+    return False
+
+
+def measure_throughput(url, concurrency, duration):
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+    stop = time.perf_counter() + duration
+
+    def client(index):
+        while time.perf_counter() < stop:
+            try:
+                urllib.request.urlopen(url, timeout=5).read()
+                counts[index] += 1
+            except (urllib.error.URLError, ConnectionError, OSError):
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration, sum(errors)
+
+
+def run(workers, args):
+    bind = '127.0.0.1:{}'.format(args.port)
+    url = 'http://{}{}'.format(bind, args.path)
+    env = dict(os.environ, GUNICORN_BIND=bind, GUNICORN_WORKERS=str(workers),
+               DATABASE_URL=args.database_url)
+
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()',
+                               '-c', 'gunicorn.conf.py', 'run:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_first_response(url, args.timeout):
+            raise SystemExit('server with {} worker(s) did not answer {}'.format(workers, url))
+        first = time.perf_counter() - start
+        rate, errors = measure_throughput(url, args.concurrency, args.duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    print('{:>7} {:>14.0f} {:>10.1f} {:>7}'.format(workers, first * 1000, rate, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--database-url', help='defaults to a new, empty SQLite database')
+    args = parser.parse_args()
+    if not args.database_url:
+        args.database_url = create_database()
+
+    print('{:>7} {:>14} {:>10} {:>7}'.format('workers', 'first req (ms)', 'req/s', 'errors'))
+    for workers in args.workers:
+        run(workers, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,10 +9,27 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING') is not None
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -20000)
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR') or \
+        os.path.join(basedir, '.jinja_cache')
+    PRECOMPILE_TEMPLATES = os.environ.get('PRECOMPILE_TEMPLATES') is not None
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT') or 0)
+    THROTTLE_ENABLED = os.environ.get('THROTTLE_DISABLED') is None
+    THROTTLE_WINDOW = int(os.environ.get('THROTTLE_WINDOW') or 300)
+    THROTTLE_IP_LIMIT = int(os.environ.get('THROTTLE_IP_LIMIT') or 30)
+    THROTTLE_EMAIL_LIMIT = int(os.environ.get('THROTTLE_EMAIL_LIMIT') or 10)
+    THROTTLE_STORAGE_URL = os.environ.get('THROTTLE_STORAGE_URL')
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED') is not None
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE') or 0.01)
+    PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL') or 0.005)
+    API_TOKENS = [token for token in (os.environ.get('API_TOKENS') or '').split(',') if token]
 
@@ -0,0 +1,32 @@
+"""
+Pre-forking production server config.
+
+    gunicorn -c gunicorn.conf.py run:app
+
+The app is loaded once in the master so forked workers share its imports and
+compiled templates.  Each worker then drops the database connections it
+inherited, opens a fresh one (kept in the pool unless the engine uses
+NullPool, as SQLite file databases do) and configures the mappers before it
+starts accepting requests.
+
+The default bind only listens on localhost, for a reverse proxy in front;
+set PROXY_COUNT to the number of proxies so the app sees client addresses.
+"""
+import multiprocessing
+import os
+
+# compile templates in the master, before forking
+os.environ.setdefault('PRECOMPILE_TEMPLATES', '1')
+
+bind = os.environ.get('GUNICORN_BIND') or '127.0.0.1:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+preload_app = True
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+
+def post_fork(server, worker):
+    from run import app
+    from app import warm_up
+
+    warm_up(app)
+    server.log.info('Worker %s warmed up', worker.pid)
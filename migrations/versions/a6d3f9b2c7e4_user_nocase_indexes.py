@@ -0,0 +1,33 @@
+"""case-insensitive user search indexes on sqlite
+
+Revision ID: a6d3f9b2c7e4
+Revises: f2a8c6d4e1b9
+Create Date: 2026-10-19 15:31:07.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3f9b2c7e4'
+down_revision = 'f2a8c6d4e1b9'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('username', 'email', 'first_name', 'last_name')
+
+
+def upgrade():
+    # MySQL's utf8_general_ci indexes already match regardless of case
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for column in COLUMNS:
+        op.execute('CREATE INDEX ix_user_{0}_nocase ON user ({0} COLLATE NOCASE)'.format(column))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for column in COLUMNS:
+        op.execute('DROP INDEX ix_user_{}_nocase'.format(column))
@@ -0,0 +1,49 @@
+"""upper-case listing post codes
+
+Revision ID: f2a8c6d4e1b9
+Revises: e93b5d2c8a17
+Create Date: 2026-10-19 15:02:44.518230
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c6d4e1b9'
+down_revision = 'e93b5d2c8a17'
+branch_labels = None
+depends_on = None
+
+listing = sa.table('listing',
+                   sa.column('id', sa.Integer),
+                   sa.column('post_code', sa.String),
+                   sa.column('version', sa.Integer))
+listing_event = sa.table('listing_event',
+                         sa.column('listing_id', sa.Integer),
+                         sa.column('action', sa.String),
+                         sa.column('created_date', sa.DateTime))
+
+
+def upgrade():
+    # compared in Python, as MySQL's case-insensitive collation would find no differences
+    connection = op.get_bind()
+    rows = connection.execute(sa.select([listing.c.id, listing.c.post_code])
+                              .where(listing.c.post_code.isnot(None))).fetchall()
+    changed = [(listing_id, post_code.upper()) for listing_id, post_code in rows
+               if post_code != post_code.upper()]
+    for listing_id, post_code in changed:
+        connection.execute(listing.update().where(listing.c.id == listing_id)
+                           .values(post_code=post_code, version=listing.c.version + 1))
+    if changed:
+        now = datetime.utcnow()
+        connection.execute(listing_event.insert(), [
+            {'listing_id': listing_id, 'action': 'update', 'created_date': now}
+            for listing_id, _ in changed])
+
+
+def downgrade():
+    # the original case is not kept
+    pass